@@ -6,143 +6,188 @@ deploy_pod.py - RunPod deployment utility for Ollama with auto-shutdown
 import argparse
 import json
 import os
-import requests
+import re
 import sys
+import textwrap
 import time
 from pathlib import Path
 from typing import Dict, Any, Optional
 
-# Import REST API client
-from runpod_rest_client import RunPodRestClient
-
 # Constants
 VERSION = "1.0.0"
 
+# Variables set from command line arguments; env files cannot override them
+_RESERVED_ENV_KEYS = frozenset({
+    "OLLAMA_HOST", "INACTIVITY_TIMEOUT", "RUNPOD_API_KEY", "LOG_LEVEL", "PRELOAD_MODELS"
+})
+
+# Closing section of the deployment banner
+_ACCESS_INFO_TEMPLATE = textwrap.dedent("""
+    Access Information:
+    Ollama API endpoint: {base_url}/
+
+    Sample API Requests:
+    # List models
+    curl {base_url}/api/tags
+
+    # Generate text
+    curl -X POST {base_url}/api/generate \\
+      -d '{{"model": "mistral", "prompt":"Hello world!"}}'
+
+    Auto-shutdown is configured for {timeout} seconds of inactivity.
+    {rule}""")
+
+# Shape of a current RunPod API key, and the characters any key can contain
+_API_KEY_RE = re.compile(r"rpa_[A-Za-z0-9]{20,}")
+_API_KEY_CHARS_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+# GPU types RunPod lists without a vendor prefix
+_BARE_GPU_TYPES = frozenset({"A100", "A40", "V100"})
+
+# KEY=VALUE line in an env file; blank lines and '#' comments never match.
+# Whitespace around the key and value is left outside the capture groups.
+_ENV_LINE_RE = re.compile(
+    r"^[ \t]*([^\s#=][^=\r\n]*?)[ \t]*=[ \t]*(.*?)[ \t\r]*$", re.MULTILINE
+)
+
 
 def load_env_file(file_path: str) -> Dict[str, str]:
     """Load environment variables from a file"""
     env_vars = {}
-    if not file_path or not os.path.exists(file_path):
+    if not file_path:
         return env_vars
     
     try:
-        with open(file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    env_vars[key.strip()] = value.strip()
+        # Read the file in one go and let the regex engine find the assignments
+        text = Path(file_path).read_text()
+    except FileNotFoundError:
+        return env_vars
     except Exception as e:
         print(f"Warning: Failed to fully parse env file: {e}")
+        return env_vars
     
+    env_vars.update(_ENV_LINE_RE.findall(text))
     return env_vars
 
-def create_pod_config(args: argparse.Namespace) -> Dict[str, Any]:
-    """Create pod configuration from arguments"""
-    # Start with required environment variables
-    env_vars = [
-        {
-            "key": "OLLAMA_HOST",
-            "value": args.ollama_host
-        },
-        {
-            "key": "INACTIVITY_TIMEOUT",
-            "value": str(args.timeout)
-        },
-        {
-            "key": "RUNPOD_API_KEY",
-            "value": args.api_key
-        },
-        {
-            "key": "LOG_LEVEL",
-            "value": args.log_level
-        }
-    ]
+def normalize_gpu_type(gpu_type: str) -> str:
+    """Return the GPU type ID RunPod expects for a user-supplied GPU name"""
+    # Leave a blank name alone so validate_pod_config can reject it
+    if not gpu_type.strip():
+        return gpu_type
+    # Any RTX 6000 Ada spelling (e.g. "RTX 6000 Ada 48GB") maps to the full ID
+    if "RTX 6000 Ada" in gpu_type and "Generation" not in gpu_type:
+        return "NVIDIA RTX 6000 Ada Generation"
+    if gpu_type.startswith("NVIDIA ") or gpu_type in _BARE_GPU_TYPES:
+        return gpu_type
+    # Add NVIDIA prefix if needed for standard types
+    return f"NVIDIA {gpu_type}"
+
+def create_pod_config(args: argparse.Namespace,
+                      file_env_vars: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Create pod configuration from arguments
+    
+    file_env_vars may carry the already-parsed contents of args.env_file;
+    when omitted the file is loaded here.
+    """
+    # Start with required environment variables; one dict keeps keys unique
+    env_map = {
+        "OLLAMA_HOST": args.ollama_host,
+        "INACTIVITY_TIMEOUT": str(args.timeout),
+        "RUNPOD_API_KEY": args.api_key,
+        "LOG_LEVEL": args.log_level,
+    }
     
     # Add preload models if specified
     if args.preload_models:
-        env_vars.append({
-            "key": "PRELOAD_MODELS",
-            "value": args.preload_models
-        })
+        env_map["PRELOAD_MODELS"] = args.preload_models
     
-    # Load additional environment variables from file if specified
-    if args.env_file:
+    # Load additional environment variables from file if specified,
+    # skipping variables we've already set
+    if file_env_vars is None and args.env_file:
         file_env_vars = load_env_file(args.env_file)
+    if file_env_vars:
         for key, value in file_env_vars.items():
-            # Skip variables we've already set
-            if key in ["OLLAMA_HOST", "INACTIVITY_TIMEOUT", "RUNPOD_API_KEY", "LOG_LEVEL", "PRELOAD_MODELS"]:
-                continue
-            env_vars.append({
-                "key": key,
-                "value": value
-            })
+            if key not in _RESERVED_ENV_KEYS:
+                env_map[key] = value
     
     # Correct GPU type format if needed
-    gpu_type = args.gpu_type
-    if "RTX 6000 Ada" in gpu_type and "Generation" not in gpu_type:
-        gpu_type = "NVIDIA RTX 6000 Ada Generation"
-        print(f"Note: Changed GPU type to '{gpu_type}' for compatibility")
-    elif not gpu_type.startswith("NVIDIA ") and gpu_type not in ["A100", "A40", "V100"]:
-        # Add NVIDIA prefix if needed for standard types
-        gpu_type = f"NVIDIA {gpu_type}"
+    gpu_type = normalize_gpu_type(args.gpu_type)
+    if gpu_type != args.gpu_type:
         print(f"Note: Changed GPU type to '{gpu_type}' for compatibility")
     
-    # Create REST API format config
+    # Create the request body in the exact shape the REST API expects
     return {
         "name": args.name,
-        "containerImageName": args.image,
+        "imageName": args.image,
         "gpuCount": 1,
         "volumeInGb": args.volume_size_gb,
         "containerDiskInGb": args.container_disk_size_gb,
-        "gpuTypeId": gpu_type,
-        "env": env_vars,
-        "ports": "11434/http",
+        "gpuTypeIds": [gpu_type],
+        "env": env_map,
+        "ports": ["11434/http"],
         "volumeMountPath": "/workspace"
     }
 
+def validate_pod_config(config: Dict[str, Any]) -> None:
+    """Check a pod configuration locally, raising ValueError if it is invalid"""
+    for field, label in (("name", "pod name"), ("imageName", "container image")):
+        if not config.get(field, "").strip():
+            raise ValueError(f"{label} must not be empty")
+    if not all(gpu_type.strip() for gpu_type in config["gpuTypeIds"]):
+        raise ValueError("GPU type must not be empty")
+    if config["gpuCount"] < 1:
+        raise ValueError("GPU count must be at least 1")
+    if config["volumeInGb"] < 0:
+        raise ValueError("volume size must not be negative")
+    if config["containerDiskInGb"] < 1:
+        raise ValueError("container disk size must be at least 1 GB")
+
 def display_pod_info(pod: Dict[str, Any], args: argparse.Namespace) -> None:
     """Display information about the deployed pod"""
-    print("\n" + "="*50)
-    print(f"Pod deployed successfully!")
-    print("="*50)
-    
     # Extract pod information
     pod_id = pod.get('id', 'Unknown')
     pod_name = pod.get('name', 'Unknown')
     image_name = pod.get('imageName', 'Unknown')
     gpu_type = pod.get('gpuType', args.gpu_type)
+    base_url = f"https://{pod_id}-11434.proxy.runpod.net"
     
-    print(f"Pod ID: {pod_id}")
-    print(f"Pod Name: {pod_name}")
-    print(f"Container Image: {image_name}")
-    print(f"GPU Type: {gpu_type}")
-    
-    print("\nConfiguration:")
-    print(f"Auto-shutdown timeout: {args.timeout} seconds")
-    
-    print("\nEnvironment Variables:")
-    print(f"OLLAMA_HOST: {args.ollama_host}")
-    print(f"LOG_LEVEL: {args.log_level}")
+    # Collect the banner and emit it with a single write
+    lines = [
+        "\n" + "="*50,
+        "Pod deployed successfully!",
+        "="*50,
+        f"Pod ID: {pod_id}",
+        f"Pod Name: {pod_name}",
+        f"Container Image: {image_name}",
+        f"GPU Type: {gpu_type}",
+        "\nConfiguration:",
+        f"Auto-shutdown timeout: {args.timeout} seconds",
+        "\nEnvironment Variables:",
+        f"OLLAMA_HOST: {args.ollama_host}",
+        f"LOG_LEVEL: {args.log_level}",
+    ]
     if args.preload_models:
-        print(f"PRELOAD_MODELS: {args.preload_models}")
+        lines.append(f"PRELOAD_MODELS: {args.preload_models}")
     if args.env_file:
-        print(f"Additional variables loaded from: {args.env_file}")
-    
-    print("\nAccess Information:")
-    print(f"Ollama API endpoint: https://{pod_id}-11434.proxy.runpod.net/")
+        lines.append(f"Additional variables loaded from: {args.env_file}")
     
-    print("\nSample API Requests:")
-    print(f"# List models")
-    print(f"curl https://{pod_id}-11434.proxy.runpod.net/api/tags")
-    print(f"\n# Generate text")
-    print(f"curl -X POST https://{pod_id}-11434.proxy.runpod.net/api/generate \\")
-    print(f"  -d '{{\"model\": \"mistral\", \"prompt\":\"Hello world!\"}}'\n")
+    lines.append(_ACCESS_INFO_TEMPLATE.format(base_url=base_url, timeout=args.timeout,
+                                              rule="="*50))
     
-    print(f"Auto-shutdown is configured for {args.timeout} seconds of inactivity.")
-    print("="*50)
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+def confirm_action(prompt: str, assume_yes: bool) -> bool:
+    """Ask the user to confirm, unless confirmation was given up front"""
+    if assume_yes:
+        return True
+    # Without a terminal nobody can answer, so fail instead of blocking forever
+    if not sys.stdin.isatty():
+        print("Error: Confirmation required but stdin is not a terminal. "
+              "Use --yes (or RUNPOD_ASSUME_YES=1) to deploy non-interactively.")
+        sys.exit(1)
+    confirm = input(prompt)
+    return confirm.lower() in {'y', 'yes'}
 
 def parse_arguments() -> argparse.Namespace:
     """Parse command line arguments"""
@@ -167,6 +212,8 @@ def parse_arguments() -> argparse.Namespace:
                         help='Minimum memory in GB')
     parser.add_argument('--image', default='p3rco/ollama-runpod:latest',
                         help='Container image to use')
+    parser.add_argument('--count', type=int, default=1,
+                        help='Number of identical pods to deploy concurrently')
     
     # Environment variable arguments
     parser.add_argument('--env-file', help='Path to environment file with KEY=VALUE pairs')
@@ -176,6 +223,10 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument('--ollama-host', default='0.0.0.0', help='Ollama host interface binding')
     
     # Other arguments
+    parser.add_argument('-y', '--yes', action='store_true',
+                        default=os.environ.get('RUNPOD_ASSUME_YES') == '1',
+                        help='Skip confirmation prompts (for scripted deployments; '
+                             'also enabled by RUNPOD_ASSUME_YES=1)')
     parser.add_argument('--version', action='version', version=f'Ollama RunPod Deployer v{VERSION}')
     
     return parser.parse_args()
@@ -185,13 +236,21 @@ def main() -> None:
     print(f"Ollama RunPod Deployer v{VERSION}")
     args = parse_arguments()
     
+    if args.count < 1:
+        print("Error: --count must be at least 1.")
+        sys.exit(1)
+    if args.timeout < 0:
+        print("Error: --timeout must not be negative.")
+        sys.exit(1)
+    
+    # Parse the env file once; it supplies the API key and the pod variables
+    file_env_vars = load_env_file(args.env_file) if args.env_file else {}
+    
     # Check for API key in env file if not provided directly
     api_key = args.api_key
-    if not api_key and args.env_file:
-        env_vars = load_env_file(args.env_file)
-        if 'RUNPOD_API_KEY' in env_vars:
-            api_key = env_vars['RUNPOD_API_KEY']
-            print("Using API key from environment file")
+    if not api_key and 'RUNPOD_API_KEY' in file_env_vars:
+        api_key = file_env_vars['RUNPOD_API_KEY']
+        print("Using API key from environment file")
     
     # Verify we have an API key from somewhere
     if not api_key:
@@ -204,20 +263,39 @@ def main() -> None:
         print("Error: RunPod API key is empty.")
         sys.exit(1)
         
+    # Reject keys that cannot be valid before touching the network; quotes or
+    # spaces usually mean the value was copied from the env file verbatim
+    if not _API_KEY_CHARS_RE.fullmatch(api_key):
+        print("Error: RunPod API key contains invalid characters (check for quotes or spaces).")
+        sys.exit(1)
+    
     # Check if API key looks like a valid RunPod API key
-    if not api_key.startswith("rpa_"):
-        print("Warning: API key doesn't start with 'rpa_'. This may not be a valid RunPod API key.")
+    if not _API_KEY_RE.fullmatch(api_key):
+        print("Warning: API key doesn't look like 'rpa_' followed by letters and digits. "
+              "This may not be a valid RunPod API key.")
         print(f"Current API key format: {api_key[:5]}...{api_key[-4:]}")
-        confirm = input("Continue anyway? (y/n): ")
-        if confirm.lower() not in ['y', 'yes']:
+        if not confirm_action("Continue anyway? (y/n): ", args.yes):
             print("Deployment cancelled.")
             return
     
+    # Store API key in args for config creation
+    args.api_key = api_key
+    
+    # Create pod configuration and reject bad values before any network traffic
+    pod_config = create_pod_config(args, file_env_vars)
+    try:
+        validate_pod_config(pod_config)
+    except ValueError as e:
+        print(f"Error: Invalid pod configuration: {e}")
+        sys.exit(1)
+    
     print(f"Deploying Ollama pod on RunPod with {args.gpu_type}...")
     
     # Display configuration summary
     print("\nDeployment configuration:")
     print(f"- Name: {args.name}")
+    if args.count > 1:
+        print(f"- Pods: {args.count} (named {args.name}-1 to {args.name}-{args.count})")
     print(f"- GPU: {args.gpu_type}")
     print(f"- Auto-shutdown: {args.timeout} seconds")
     print(f"- System: {args.min_vcpu} vCPU, {args.min_memory_gb} GB RAM")
@@ -227,34 +305,42 @@ def main() -> None:
         print(f"- Environment file: {args.env_file}")
     
     # Ask for confirmation
-    confirm = input("\nProceed with deployment? (y/n): ")
-    if confirm.lower() not in ['y', 'yes']:
+    if not confirm_action("\nProceed with deployment? (y/n): ", args.yes):
         print("Deployment cancelled.")
         return
     
-    # Create REST API client
-    client = RunPodRestClient(api_key)
-    
-    # Verify API key is valid
-    print("Verifying RunPod API key...")
-    if not client.verify_api_key():
-        print("Error: Invalid RunPod API key. Please check your API key and try again.")
-        sys.exit(1)
-    
-    # Store API key in args for config creation
-    args.api_key = api_key
-    
-    # Create pod configuration
-    pod_config = create_pod_config(args)
+    # Import REST API client only now, so --help and --version don't pay for
+    # loading requests/urllib3
+    from runpod_rest_client import RunPodRestClient
     
-    # Deploy pod
-    print("Deploying pod... (this may take a minute)")
-    try:
-        pod = client.deploy_pod(pod_config)
-        display_pod_info(pod, args)
-    except Exception as e:
-        print(f"Error deploying pod: {e}")
-        sys.exit(1)
+    # Create REST API client
+    # The API key is checked by the deploy request itself (an invalid key is
+    # rejected with 401), which saves a separate verification round-trip
+    with RunPodRestClient(api_key) as client:
+        # Give each pod a distinct name when deploying more than one
+        if args.count == 1:
+            pod_configs = [pod_config]
+        else:
+            pod_configs = [dict(pod_config, name=f"{args.name}-{i}")
+                           for i in range(1, args.count + 1)]
+        
+        # Deploy pods; multiple deployments run concurrently
+        if args.count == 1:
+            print("Deploying pod... (this may take a minute)")
+        else:
+            print(f"Deploying {args.count} pods concurrently... (this may take a minute)")
+        failures = 0
+        for result in client.deploy_many(pod_configs):
+            if isinstance(result, Exception):
+                print(f"Error deploying pod: {result}")
+                failures += 1
+            else:
+                display_pod_info(result, args)
+        
+        if failures:
+            if args.count > 1:
+                print(f"Error: {failures} of {args.count} pod deployments failed.")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -5,29 +5,84 @@ runpod_rest_client.py - RunPod REST API client for deploying pods
 
 import requests
 import json
+import os
+import random
 import sys
-from typing import Dict, Any, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeout in seconds; requests waits forever by default
+REQUEST_TIMEOUT = (5, 60)
+
+# Statuses for which RunPod has not created the pod, so a deploy request can
+# safely be sent again; other errors may follow a partial deployment
+DEPLOY_RETRY_STATUSES = frozenset({429, 503})
+# Four retries from a 0.5s base wait at most 0.5+1+2+4 seconds (6s for the
+# last one with jitter), so the retry count alone bounds the backoff
+DEPLOY_MAX_RETRIES = 4
+DEPLOY_BACKOFF_SECONDS = 0.5
+# Longest server-requested Retry-After we will wait out before giving up
+DEPLOY_RETRY_AFTER_MAX_SECONDS = 30.0
+
+class RunPodAPIError(Exception):
+    """Error response from the RunPod API"""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
 
 class RunPodRestClient:
     """Client for interacting with RunPod REST API"""
     
-    def __init__(self, api_key: str):
-        """Initialize with API key"""
+    __slots__ = ("api_key", "base_url", "headers", "session", "debug")
+    
+    def __init__(self, api_key: str, debug: Optional[bool] = None):
+        """Initialize with API key
+        
+        debug enables request dumps; it defaults to the RUNPOD_DEBUG
+        environment variable being set to 1.
+        """
         self.api_key = api_key
+        if debug is None:
+            debug = os.environ.get("RUNPOD_DEBUG") == "1"
+        self.debug = debug
         self.base_url = "https://rest.runpod.io/v1"
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
         }
+        # Reuse one session so every call after the first skips the TCP/TLS handshake
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retry throttling and transient server errors; urllib3 leaves POST out of
+        # status retries by default, so a pod deployment is never submitted twice.
+        # urllib3 would sleep for any Retry-After with no upper bound, so it uses
+        # its own backoff instead; _post_with_retry applies the bounded policy
+        retries = Retry(total=3, backoff_factor=0.3,
+                        status_forcelist=[429, 500, 502, 503, 504],
+                        respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retries)
+        self.session.mount("https://", adapter)
+    
+    def close(self) -> None:
+        """Close the underlying HTTP session"""
+        self.session.close()
+    
+    def __enter__(self) -> "RunPodRestClient":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
     
     def verify_api_key(self) -> bool:
         """Verify that the API key is valid by making a simple request"""
         try:
-            # Try to list pods as a simple check
-            response = requests.get(
-                f"{self.base_url}/pods",
-                headers=self.headers
-            )
+            # Try to list pods as a simple check. The body is read in full so
+            # the connection goes back to the pool for the deploy that follows
+            response = self.session.get(f"{self.base_url}/pods", timeout=REQUEST_TIMEOUT)
             
             if response.status_code != 200:
                 print(f"API Key verification failed: {response.status_code} - {response.text}")
@@ -41,66 +96,99 @@ class RunPodRestClient:
             print(f"API Key verification failed: {e}")
             return False
     
+    @staticmethod
+    def _retry_delay(response: requests.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next deploy attempt, or None to give up"""
+        # Honour the server's Retry-After (in seconds) when it sends one; if it
+        # asks for longer than we are willing to wait, stop retrying
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            # Exponential backoff with jitter, so concurrent deploys don't retry in lockstep
+            return DEPLOY_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random() * 0.5)
+        if retry_after > DEPLOY_RETRY_AFTER_MAX_SECONDS:
+            return None
+        return max(0.0, retry_after)
+    
+    def _post_with_retry(self, url: str, body: bytes) -> requests.Response:
+        """POST a request, backing off while the API is throttling or unavailable"""
+        for attempt in range(DEPLOY_MAX_RETRIES + 1):
+            response = self.session.post(url, data=body, timeout=REQUEST_TIMEOUT)
+            if response.status_code not in DEPLOY_RETRY_STATUSES or attempt == DEPLOY_MAX_RETRIES:
+                return response
+            
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                return response
+            print(f"RunPod API returned {response.status_code}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+        return response
+    
     def deploy_pod(self, config: Dict[str, Any]) -> Dict[str, Any]:
-        """Deploy a pod using the REST API"""
+        """Deploy a pod using the REST API
+        
+        config is the POST /pods request body as built by create_pod_config,
+        with env as a {name: value} dict and ports as a list of strings.
+        """
         try:
             print(f"Sending pod deployment request to RunPod REST API")
             
-            # Convert env list to object (dictionary)
-            env_dict = {}
-            if "env" in config and isinstance(config["env"], list):
-                for env_var in config["env"]:
-                    if "key" in env_var and "value" in env_var:
-                        env_dict[env_var["key"]] = env_var["value"]
-            
-            # Convert ports string to array of strings
-            ports_array = []
-            if "ports" in config and isinstance(config["ports"], str):
-                # Split by comma if multiple ports are provided
-                port_strings = config["ports"].split(",")
-                for port_str in port_strings:
-                    ports_array.append(port_str.strip())
+            # Print request data for debugging. Off by default: the body holds
+            # the API key and pretty-printing it is wasted work otherwise
+            if self.debug:
+                print(f"Request URL: {self.base_url}/pods")
+                print(f"Request body: {json.dumps(config, indent=2)}")
             
-            # Get GPU type as array for gpuTypeIds
-            gpu_type = config.get("gpuTypeId", "NVIDIA RTX A5000")
-            gpu_types_array = [gpu_type]
+            # Send request to create pod; the body is encoded once, without
+            # the whitespace that json.dumps adds by default
+            body = json.dumps(config, separators=(",", ":")).encode("utf-8")
+            response = self._post_with_retry(f"{self.base_url}/pods", body)
             
-            # Format the config for the REST API
-            rest_config = {
-                "name": config.get("name", "Ollama-Pod"),
-                "imageName": config.get("containerImageName", "runpod/pytorch:latest"),
-                "gpuCount": config.get("gpuCount", 1),
-                "volumeInGb": config.get("volumeInGb", 50),
-                "containerDiskInGb": config.get("containerDiskInGb", 5),
-                "gpuTypeIds": gpu_types_array,  # Updated to gpuTypeIds (plural)
-                "env": env_dict,
-                "ports": ports_array,
-                "volumeMountPath": config.get("volumeMountPath", "/workspace")
-            }
-            
-            # Print request data for debugging
-            print(f"Request URL: {self.base_url}/pods")
-            print(f"Request body: {json.dumps(rest_config, indent=2)}")
-            
-            # Send request to create pod
-            response = requests.post(
-                f"{self.base_url}/pods", 
-                headers=self.headers, 
-                json=rest_config
-            )
-            
-            # Check for errors
+            # Check for errors, decoding the error body only once. The deploy
+            # request doubles as the API key check, so authentication and
+            # permission failures get their own messages; the server's
+            # explanation is kept since it is the only diagnostic available
             if response.status_code != 200:
                 print(f"REST API Error - Status Code: {response.status_code}")
-                print(f"Response: {response.text}")
-                raise Exception(f"Failed to deploy pod: {response.text}")
+                error_text = response.text
+                if response.status_code == 401:
+                    message = ("Invalid RunPod API key. Please check your API key "
+                               f"and try again: {error_text}")
+                elif response.status_code == 403:
+                    message = ("RunPod API key is not permitted to deploy pods "
+                               f"(it may be read-only): {error_text}")
+                else:
+                    message = f"Failed to deploy pod: {error_text}"
+                raise RunPodAPIError(message, response.status_code)
             
-            # Parse response
-            pod_data = response.json()
+            # Parse response straight from the raw bytes (json.loads detects
+            # the encoding itself, skipping the intermediate str decode)
+            pod_data = json.loads(response.content)
             print(f"Pod deployed successfully via REST API!")
             
             return pod_data
             
         except Exception as e:
             print(f"Error deploying pod: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def deploy_many(self, configs: List[Dict[str, Any]],
+                    max_workers: int = 10) -> List[Union[Dict[str, Any], Exception]]:
+        """Deploy several pods concurrently over the shared session
+        
+        Results are returned in the order of configs. A deployment that failed
+        is returned as the exception it raised, so pods that did start are
+        still reported to the caller.
+        """
+        # Never run more requests at once than the connection pool can hold
+        workers = max(1, min(max_workers, len(configs)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.deploy_pod, config) for config in configs]
+        
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results